@@ -1,17 +1,89 @@
 import asyncio
-import tempfile
+import concurrent.futures
 import io
 import zipfile
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import AsyncIterator, Dict, Iterator, List, Any, Tuple
 import time
+import threading
 
 import streamlit as st
 
-from utils.pdf_utils import extract_text_from_pdf_bytes
-from utils.tts_utils import batch_texts_to_mp3  # Updated import
+from utils.pdf_utils import content_digest, estimate_word_count, extract_texts_parallel
+from utils.pipeline import NO_TEXT_ERROR, iter_pdfs_to_mp3, mp3_file_name
+from utils.tts_utils import make_shared_connector
 from components.word_count_table import show_word_count_table
 
+# MP3s larger than this are only offered inside the ZIP, so each one isn't
+# held in memory twice by individual download buttons
+INLINE_DOWNLOAD_MAX_BYTES = 20 * 1024 * 1024
+
+VOICE_OPTIONS = {
+    "English (UK) – Ryan (Male, Neural)": "en-GB-RyanNeural",
+    "English (UK) – Sonia (Female, Neural)": "en-GB-SoniaNeural",
+    "English (US) – Jenny (Female, Neural)": "en-US-JennyNeural",
+    "English (US) – Guy (Male, Neural)": "en-US-GuyNeural",
+    "English (Australia) – Natasha (Female, Neural)": "en-AU-NatashaNeural",
+    "English (Australia) – William (Male, Neural)": "en-AU-WilliamNeural",
+}
+
+@st.cache_resource
+def get_event_loop() -> asyncio.AbstractEventLoop:
+    """
+    Returns a background event loop shared across Streamlit reruns, so TTS
+    jobs don't pay for a new loop on every conversion.
+    """
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    return loop
+
+@st.cache_resource
+def get_tts_connector():
+    """
+    Returns an Edge TTS connector bound to the shared event loop, so its DNS
+    cache and connection pool are reused by every conversion.
+    """
+    return asyncio.run_coroutine_threadsafe(make_shared_connector(), get_event_loop()).result()
+
+def iter_on_loop(agen: AsyncIterator[Any], loop: asyncio.AbstractEventLoop) -> Iterator[Any]:
+    """
+    Iterates an async generator on the background loop from the script thread,
+    so results can be rendered as they arrive.
+    """
+    try:
+        while True:
+            try:
+                yield asyncio.run_coroutine_threadsafe(agen.__anext__(), loop).result()
+            except StopAsyncIteration:
+                return
+    finally:
+        # Stops the pipeline if the script run is interrupted mid-batch
+        asyncio.run_coroutine_threadsafe(agen.aclose(), loop)
+
+def build_zip(mp3_files: Dict[str, bytes]) -> bytes:
+    """
+    Packs MP3 bytes (keyed by file name) into a ZIP archive. MP3 is already
+    compressed, so entries are stored instead of deflated.
+    """
+    zip_buffer = io.BytesIO()
+    with zipfile.ZipFile(zip_buffer, "w", compression=zipfile.ZIP_STORED, allowZip64=True) as zipf:
+        for mp3_name, mp3_bytes in mp3_files.items():
+            zipf.writestr(mp3_name, mp3_bytes)
+    return zip_buffer.getvalue()
+
+def get_extracted(blobs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Returns {"text", "word_count"} for each blob (dict with keys: name, bytes,
+    digest), extracting only PDFs not already cached in this session so reruns
+    don't parse them again. Entries for PDFs no longer uploaded are dropped.
+    """
+    cache = st.session_state.setdefault("pdf_cache", {})
+    missing = [b for b in blobs if b["digest"] not in cache]
+    for blob, text in zip(missing, extract_texts_parallel(missing)):
+        cache[blob["digest"]] = {"text": text, "word_count": estimate_word_count(text)}
+    st.session_state.pdf_cache = {b["digest"]: cache[b["digest"]] for b in blobs}
+    return [cache[b["digest"]] for b in blobs]
+
 st.set_page_config(page_title="PDF → MP3 (offline Edge‑TTS)", layout="centered")
 st.markdown(
     """
@@ -41,174 +113,197 @@ uploaded_files = st.file_uploader(
     label_visibility="visible",
 )
 
-# Deduplicate uploaded files by name
+# Read each PDF once and deduplicate by content: a PDF identical to an earlier
+# upload under another name is converted once and its MP3 reused (aliases maps
+# the extra name to the first); different PDFs sharing a name are both kept.
+# Digests are remembered per upload, so reruns skip re-reading extracted PDFs.
+pdf_blobs = []
+aliases: Dict[str, str] = {}
 if uploaded_files:
-    unique_files = []
-    seen_names = set()
+    upload_digests = st.session_state.setdefault("upload_digests", {})
+    pdf_cache = st.session_state.setdefault("pdf_cache", {})
+    # digest -> (uploaded name, display name) of its first upload
+    seen_digests: Dict[bytes, Tuple[str, str]] = {}
+    name_counts: Dict[str, int] = {}
     for uploaded in uploaded_files:
-        if uploaded.name not in seen_names:
-            unique_files.append(uploaded)
-            seen_names.add(uploaded.name)
-        else:
+        pdf_bytes = None
+        digest = upload_digests.get(uploaded.file_id)
+        if digest not in pdf_cache:
+            # getvalue() shares the upload's bytes (no copy) and, unlike
+            # read(), doesn't depend on the read position
+            pdf_bytes = uploaded.getvalue()
+            digest = content_digest(pdf_bytes)
+            upload_digests[uploaded.file_id] = digest
+        first = seen_digests.get(digest)
+        if first is not None and first[0] == uploaded.name:
             st.warning(f"���️ Duplicate file `{uploaded.name}` was ignored.")
-    uploaded_files = unique_files
+            continue
+        name = uploaded.name
+        name_counts[name] = name_counts.get(name, 0) + 1
+        if name_counts[name] > 1:
+            name = f"{Path(name).stem} ({name_counts[name]}){Path(name).suffix}"
+        if first is not None:
+            st.info(f"ℹ️ `{name}` has identical content to `{first[1]}` – reusing its MP3.")
+            aliases[name] = first[1]
+            continue
+        seen_digests[digest] = (uploaded.name, name)
+        pdf_blobs.append({"name": name, "bytes": pdf_bytes, "digest": digest})
+    st.session_state.upload_digests = {
+        f.file_id: upload_digests[f.file_id] for f in uploaded_files
+    }
+else:
+    # Every upload was removed: drop what the earlier ones left in the session
+    st.session_state.upload_digests = {}
+    st.session_state.pdf_cache = {}
 
-# Prepare file data and show word count table
-if uploaded_files:
+# Prepare file data and show word count table. Only text and word counts are
+# kept; the PDF bytes are dropped once extracted.
+if pdf_blobs:
     file_data = []
-    for uploaded in uploaded_files:
-        # Read PDF bytes once and reuse
-        pdf_bytes = uploaded.read()
-        text = extract_text_from_pdf_bytes(pdf_bytes, uploaded.name)
-        word_count = len(text.split())
+    # Extraction is CPU-bound, so new files are fanned out across processes
+    # and cached by content digest
+    for blob, extracted in zip(pdf_blobs, get_extracted(pdf_blobs)):
+        word_count = extracted["word_count"]
         est_time = max(1, int(word_count / 100 * 2))
         file_data.append({
-            "uploaded": uploaded,
-            "name": uploaded.name,
-            "bytes": pdf_bytes,
-            "text": text,
+            "name": blob["name"],
+            "text": extracted["text"],
             "word_count": word_count,
             "est_time": est_time,
         })
+    del pdf_blobs
     show_word_count_table(file_data)
 else:
     file_data = []
 
-st.divider()
-st.markdown('<div class="section-header">2️⃣ Select Voice</div>', unsafe_allow_html=True)
-VOICE_OPTIONS = {
-    "English (UK) – Ryan (Male, Neural)": "en-GB-RyanNeural",
-    "English (UK) – Sonia (Female, Neural)": "en-GB-SoniaNeural",
-    "English (US) – Jenny (Female, Neural)": "en-US-JennyNeural",
-    "English (US) – Guy (Male, Neural)": "en-US-GuyNeural",
-    "English (Australia) – Natasha (Female, Neural)": "en-AU-NatashaNeural",
-    "English (Australia) – William (Male, Neural)": "en-AU-WilliamNeural",
-}
-voice_name = st.selectbox(
-    "🔊 Choose an English voice",
-    list(VOICE_OPTIONS.keys()),
-    index=0,
-    label_visibility="visible",
-    key="voice_picker",
-)
-voice_id = VOICE_OPTIONS[voice_name]
+@st.fragment
+def convert_section(file_data: List[Dict[str, Any]], aliases: Dict[str, str]) -> None:
+    """
+    Voice, speed and conversion controls plus results. Runs as a fragment so
+    interacting with these widgets doesn't rerun the upload/extraction block.
+    aliases maps extra upload names to the file whose MP3 they share.
+    """
+    st.divider()
+    st.markdown('<div class="section-header">2️⃣ Select Voice</div>', unsafe_allow_html=True)
+    voice_name = st.selectbox(
+        "🔊 Choose an English voice",
+        list(VOICE_OPTIONS.keys()),
+        index=0,
+        label_visibility="visible",
+        key="voice_picker",
+    )
+    voice_id = VOICE_OPTIONS[voice_name]
 
-st.divider()
-st.markdown('<div class="section-header">3️⃣ Conversion Settings</div>', unsafe_allow_html=True)
-# Add speed control slider (using percentage values for edge-tts compatibility)
-speed_value = st.slider("🗣️ TTS Speed", min_value=-50, max_value=100, value=0, step=5)
-# Convert to edge-tts format
-speed = f"{speed_value}%"
+    st.divider()
+    st.markdown('<div class="section-header">3️⃣ Conversion Settings</div>', unsafe_allow_html=True)
+    # Add speed control slider (using percentage values for edge-tts compatibility)
+    speed_value = st.slider("🗣️ TTS Speed", min_value=-50, max_value=100, value=0, step=5)
+    # Convert to edge-tts format
+    speed = f"{speed_value}%"
 
-st.divider()
-st.markdown('<div class="section-header">4️⃣ Conversion</div>', unsafe_allow_html=True)
+    st.divider()
+    st.markdown('<div class="section-header">4️⃣ Conversion</div>', unsafe_allow_html=True)
 
-convert_clicked = st.button("🚀 Convert PDFs to MP3", type="primary")
+    convert_clicked = st.button("🚀 Convert PDFs to MP3", type="primary")
 
-if not uploaded_files:
-    st.info("👈 Select at least one PDF to start.")
-    st.stop()
+    if not file_data:
+        st.info("👈 Select at least one PDF to start.")
+        return
 
-if convert_clicked:
-    with tempfile.TemporaryDirectory() as tmp_dir:
-        output_dir = Path(tmp_dir)
+    if convert_clicked:
         progress_bar = st.progress(0)
         status_placeholder = st.empty()
-        generated_files: List[Path] = []
-
-        tts_tasks = []
-        extraction_failures = []
-        warning_msgs = []
-        
-        # Process files with better error handling and progress tracking
-        for i, f in enumerate(file_data):
-            if not f["text"]:
-                warning_msgs.append(f"���️ No readable text found in **{f['name']}** – skipping.")
-                extraction_failures.append(f["name"])
-                continue
-            
-            base_name = Path(f["name"]).stem
-            out_path = output_dir / f"{base_name}_edge.mp3"
-            tts_tasks.append({"text": f["text"], "out_path": out_path, "name": f["name"]})
-            
-            # Update progress bar
-            progress_bar.progress((i + 1) / len(file_data))
-
-        if warning_msgs:
-            st.warning("\n".join(warning_msgs))
-        if extraction_failures:
-            st.info(f"ℹ️ The following files could not be extracted and were skipped: {', '.join(extraction_failures)}")
-
-        generated_files: List[Path] = []
-        if tts_tasks:
-            status_placeholder.info("🎙️ Converting all files to MP3 in parallel…")
-            start_time = time.perf_counter()
-            
-            try:
-                # Process tasks in batches to avoid overwhelming the system
-                batch_size = min(5, len(tts_tasks))  # Limit concurrent tasks
-                results = []
-                
-                for i in range(0, len(tts_tasks), batch_size):
-                    batch = tts_tasks[i:i + batch_size]
-                    batch_results = asyncio.run(batch_texts_to_mp3(batch, voice=voice_id, rate=speed))
-                    results.extend(batch_results)
-                    
-                    # Update progress bar for batch completion
-                    progress_bar.progress(min((i + batch_size) / len(tts_tasks), 1.0))
-                
-                elapsed = time.perf_counter() - start_time
-                
-                success_msgs = []
-                error_msgs = []
-                for res in results:
-                    if res.get("success"):
-                        success_msgs.append(f"��� **{res['name']}** → `{Path(res['out_path']).name}`")
-                        generated_files.append(res['out_path'])
-                    else:
-                        error_msgs.append(f"❌ **{res['name']}** failed: {res['error']}")
-                        
-                if success_msgs:
-                    st.success("\n".join(success_msgs))
-                if error_msgs:
-                    st.error("\n".join(error_msgs))
-                if not success_msgs:
-                    st.warning("���️ No files were converted successfully.")
-                st.info(f"⏱️ Conversion completed in {elapsed:.1f} seconds.")
-                
-            except Exception as exc:
-                st.exception(exc)
-        else:
-            st.warning("���️ No valid PDF files to convert.")
+        # MP3 bytes stay in memory, keyed by download file name
+        generated_files: Dict[str, bytes] = {}
+        # Text extracted for the preview is reused, so Convert does no PDF
+        # parsing of its own
+        pipeline_files = [
+            {"name": f["name"], "text": f["text"]}
+            for f in file_data
+        ]
+        status_placeholder.info("🎙️ Converting all files to MP3 in parallel…")
+        start_time = time.perf_counter()
+
+        try:
+            extraction_failures = []
+            success_msgs = []
+            error_msgs = []
+            total = len(pipeline_files)
+            # Throttle UI updates to ~20 per batch; each one is a websocket message
+            update_every = max(1, total // 20)
+            results = iter_on_loop(
+                iter_pdfs_to_mp3(pipeline_files, voice=voice_id, rate=speed, connector=get_tts_connector()),
+                get_event_loop(),
+            )
+            for done, res in enumerate(results, start=1):
+                if done % update_every == 0 or done == total:
+                    progress_bar.progress(done / total)
+                    status_placeholder.info(f"🎙️ Finished {done}/{total}: **{res['name']}**")
+                for msg in res.get("warnings", []):
+                    st.warning(msg)
+                if res.get("success"):
+                    success_msgs.append(f"��� **{res['name']}** → `{res['file_name']}`")
+                    generated_files[res['file_name']] = res['mp3']
+                    for alias, target in aliases.items():
+                        if target == res['name']:
+                            generated_files[mp3_file_name(alias)] = res['mp3']
+                elif res["error"] == NO_TEXT_ERROR:
+                    extraction_failures.append(res["name"])
+                else:
+                    error_msgs.append(f"❌ **{res['name']}** failed: {res['error']}")
+
+            elapsed = time.perf_counter() - start_time
+
+            if extraction_failures:
+                st.warning("\n".join(
+                    f"���️ No readable text found in **{name}** – skipping."
+                    for name in extraction_failures
+                ))
+                st.info(f"ℹ️ The following files could not be extracted and were skipped: {', '.join(extraction_failures)}")
+            if success_msgs:
+                st.success("\n".join(success_msgs))
+            if error_msgs:
+                st.error("\n".join(error_msgs))
+            if not success_msgs:
+                st.warning("���️ No files were converted successfully.")
+            st.info(f"⏱️ Conversion completed in {elapsed:.1f} seconds.")
+
+        except Exception as exc:
+            st.exception(exc)
 
         status_placeholder.empty()
         st.balloons()
 
         if generated_files:
-            st.markdown('<div class="section-header">5️⃣ Download Results</div>', unsafe_allow_html=True)
-            st.markdown(
-                f'<div class="result-card">🎉 <b>{len(generated_files)}</b> MP3 file(s) ready for download!</div>',
-                unsafe_allow_html=True,
-            )
-            for idx, mp3_path in enumerate(generated_files):
-                with open(mp3_path, "rb") as f:
+            # Build the ZIP in the background while the per-file buttons render
+            with concurrent.futures.ThreadPoolExecutor(max_workers=1) as zip_executor:
+                zip_future = zip_executor.submit(build_zip, generated_files)
+                st.markdown('<div class="section-header">5️⃣ Download Results</div>', unsafe_allow_html=True)
+                st.markdown(
+                    f'<div class="result-card">🎉 <b>{len(generated_files)}</b> MP3 file(s) ready for download!</div>',
+                    unsafe_allow_html=True,
+                )
+                zip_only = []
+                for idx, (mp3_name, mp3_bytes) in enumerate(generated_files.items()):
+                    if len(mp3_bytes) >= INLINE_DOWNLOAD_MAX_BYTES:
+                        zip_only.append(mp3_name)
+                        continue
                     st.download_button(
-                        label=f"Download `{mp3_path.name}`",
-                        data=f,
-                        file_name=mp3_path.name,
+                        label=f"Download `{mp3_name}`",
+                        data=mp3_bytes,
+                        file_name=mp3_name,
                         mime="audio/mpeg",
-                        key=f"download_{mp3_path.name}_{idx}",  # <-- ensures uniqueness
+                        key=f"download_{mp3_name}_{idx}",  # <-- ensures uniqueness
                     )
-            zip_buffer = io.BytesIO()
-            with zipfile.ZipFile(zip_buffer, "w") as zipf:
-                for mp3_path in generated_files:
-                    zipf.write(mp3_path, arcname=mp3_path.name)
-            zip_buffer.seek(0)
-            st.download_button(
-                label="⬇️ Download ALL as ZIP",
-                data=zip_buffer,
-                file_name="converted_mp3s.zip",
-                mime="application/zip",
-            )
+                if zip_only:
+                    st.info(f"ℹ️ Large files are only included in the ZIP: {', '.join(zip_only)}")
+                st.download_button(
+                    label="⬇️ Download ALL as ZIP",
+                    data=zip_future.result(),
+                    file_name="converted_mp3s.zip",
+                    mime="application/zip",
+                )
         else:
-            st.info("No MP3 files were generated.")
\ No newline at end of file
+            st.info("No MP3 files were generated.")
+
+convert_section(file_data, aliases)
@@ -2,6 +2,7 @@
 Streamlit component for displaying PDF word counts and estimated conversion times.
 """
 
+import pandas as pd
 import streamlit as st
 
 def show_word_count_table(file_data):
@@ -12,10 +13,14 @@ def show_word_count_table(file_data):
     if not file_data:
         return
     st.markdown('<div class="section-header">📊 PDF Word Counts</div>', unsafe_allow_html=True)
-    st.table([
-        {"File": f["name"], "Words": f["word_count"], "Est. Time (s)": f["est_time"]}
-        for f in file_data
-    ])
+    # Build the frame column-wise; st.dataframe renders rows virtually, so
+    # large batches don't put every row in the DOM
+    df = pd.DataFrame({
+        "File": [f["name"] for f in file_data],
+        "Words": [f["word_count"] for f in file_data],
+        "Est. Time (s)": [f["est_time"] for f in file_data],
+    })
+    st.dataframe(df, hide_index=True)
     total_words = sum(f["word_count"] for f in file_data)
     total_est_time = sum(f["est_time"] for f in file_data)
     st.markdown(
@@ -0,0 +1,25 @@
+"""
+Shared test fixtures.
+"""
+
+import fitz
+import pytest
+
+def _make_pdf(*page_texts: str) -> bytes:
+    """
+    Builds PDF bytes with one page per argument; blank strings give pages
+    without text, and lines in a page's text are drawn one below another.
+    """
+    doc = fitz.open()
+    for text in page_texts:
+        page = doc.new_page()
+        if text:
+            page.insert_text((72, 72), text)
+    pdf_bytes = doc.write()
+    doc.close()
+    return pdf_bytes
+
+@pytest.fixture
+def make_pdf():
+    """Returns a helper that builds PDF bytes from per-page texts."""
+    return _make_pdf
@@ -3,7 +3,7 @@ Unit tests for PDF extraction utilities.
 """
 
 import os
-from utils.pdf_utils import extract_text_from_pdf_bytes
+from utils.pdf_utils import content_digest, estimate_word_count, extract_text_from_pdf_bytes, extract_texts_parallel
 
 def test_extract_text_from_pdf_bytes_empty():
     """Should return empty string for empty bytes."""
@@ -13,14 +13,73 @@ def test_extract_text_from_pdf_bytes_invalid():
     """Should return empty string for invalid PDF bytes."""
     assert extract_text_from_pdf_bytes(b"not a pdf", "fake.pdf") == ""
 
-def test_extract_text_from_pdf_bytes_real_pdf():
+def test_extract_text_from_pdf_bytes_real_pdf(make_pdf):
     """Should extract text from a real PDF file."""
-    # Create a simple PDF for testing
+    text = extract_text_from_pdf_bytes(make_pdf("Hello, PDF test!"), "test.pdf")
+    assert "Hello, PDF test!" in text
+
+def test_extract_texts_parallel_preserves_order(make_pdf):
+    """Should return one text per file, in input order."""
+    files = [{"name": f"{word}.pdf", "bytes": make_pdf(word)} for word in ("alpha", "bravo", "charlie")]
+    files.append({"name": "broken.pdf", "bytes": b"not a pdf"})
+    texts = extract_texts_parallel(files)
+    assert [t.strip() for t in texts] == ["alpha", "bravo", "charlie", ""]
+
+def test_estimate_word_count():
+    """Should count space/newline separated words and treat blank text as zero."""
+    assert estimate_word_count("") == 0
+    assert estimate_word_count(" \n ") == 0
+    assert estimate_word_count("one") == 1
+    assert estimate_word_count("one two\nthree four") == 4
+
+def test_extract_text_from_pdf_bytes_cache_keyed_on_digest(make_pdf):
+    """Should serve a cached result for a known digest without re-parsing."""
+    pdf_bytes = make_pdf("Digest keyed")
+    digest = content_digest(pdf_bytes)
+    assert "Digest keyed" in extract_text_from_pdf_bytes(pdf_bytes, "a.pdf", digest)
+    assert "Digest keyed" in extract_text_from_pdf_bytes(b"ignored", "a.pdf", digest)
+
+def test_extract_text_from_pdf_bytes_keeps_line_breaks(make_pdf):
+    """Should keep line breaks instead of collapsing all whitespace."""
+    pdf_bytes = make_pdf("First line\nSecond line")
+    assert extract_text_from_pdf_bytes(pdf_bytes, "lines.pdf") == "First line\nSecond line"
+
+def test_extract_core_skips_image_only_pdf(make_pdf):
+    """Should give up on a long PDF whose first and middle pages have no text."""
+    from utils.pdf_utils import _extract_core
+    text, warnings, error = _extract_core(make_pdf(*[""] * 10, "Late text"), "scan.pdf")
+    assert (text, error) == ("", None)
+    assert len(warnings) == 1 and "OCR required" in warnings[0]
+
+def test_extract_core_reads_all_pages_after_probe(make_pdf):
+    """Should read every page once a probe page has text."""
+    from utils.pdf_utils import _extract_core
+    text, warnings, error = _extract_core(make_pdf(*[f"Page {i}" for i in range(12)]), "long.pdf")
+    assert text.split() == [w for i in range(12) for w in ("Page", str(i))]
+    assert warnings == [] and error is None
+
+def test_extract_texts_parallel_uses_digest_cache(make_pdf):
+    """Should store batch results by digest and serve them without re-parsing."""
+    files = []
+    for word in ("delta", "echo"):
+        pdf_bytes = make_pdf(word)
+        files.append({"name": f"{word}.pdf", "bytes": pdf_bytes, "digest": content_digest(pdf_bytes)})
+    assert [t.strip() for t in extract_texts_parallel(files)] == ["delta", "echo"]
+    cached = [dict(f, bytes=b"ignored") for f in files]
+    assert [t.strip() for t in extract_texts_parallel(cached)] == ["delta", "echo"]
+
+def test_extract_core_reads_on_when_probe_page_fails(make_pdf, monkeypatch):
+    """Should not call a PDF image-only when a probe page couldn't be read."""
     import fitz
-    doc = fitz.open()
-    page = doc.new_page()
-    page.insert_text((72, 72), "Hello, PDF test!")
-    pdf_bytes = doc.write()
-    doc.close()
-    text = extract_text_from_pdf_bytes(pdf_bytes, "test.pdf")
-    assert "Hello, PDF test!" in text
\ No newline at end of file
+    from utils.pdf_utils import _extract_core
+    get_text = fitz.Page.get_text
+
+    def flaky_get_text(page, *args, **kwargs):
+        if page.number == 0:
+            raise RuntimeError("broken page")
+        return get_text(page, *args, **kwargs)
+
+    monkeypatch.setattr(fitz.Page, "get_text", flaky_get_text)
+    text, warnings, error = _extract_core(make_pdf(*[""] * 10, "Late text"), "flaky.pdf")
+    assert (text, error) == ("Late text", None)
+    assert len(warnings) == 1 and "Page(s) 1 " in warnings[0]
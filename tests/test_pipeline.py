@@ -0,0 +1,48 @@
+"""
+Unit tests for the extraction-to-TTS pipeline.
+"""
+
+import asyncio
+import pytest
+import utils.tts_utils as tts_utils
+from utils.pipeline import NO_TEXT_ERROR, iter_pdfs_to_mp3, mp3_file_name, pdfs_to_mp3
+
+async def _fake_tts(text, out_path=None, voice="en-GB-RyanNeural", rate="+0%", connector=None):
+    return text.encode()
+
+@pytest.mark.asyncio
+async def test_pdfs_to_mp3_extracts_and_converts(monkeypatch, make_pdf):
+    """Should parse files without text, reuse given text and skip empty ones."""
+    monkeypatch.setattr(tts_utils, "_async_tts", _fake_tts)
+    files = [
+        {"name": "parsed.pdf", "bytes": make_pdf("Parsed in the pipeline")},
+        {"name": "cached.pdf", "bytes": b"", "text": "Already extracted"},
+        {"name": "blank.pdf", "bytes": b"", "text": ""},
+    ]
+    results = await pdfs_to_mp3(files, voice="en-GB-RyanNeural")
+    by_name = {r["name"]: r for r in results}
+    assert len(results) == 3
+    assert by_name["blank.pdf"] == {"name": "blank.pdf", "success": False, "error": NO_TEXT_ERROR, "warnings": []}
+    assert by_name["cached.pdf"]["mp3"] == b"Already extracted"
+    assert by_name["cached.pdf"]["file_name"] == "cached_edge.mp3"
+    assert by_name["parsed.pdf"]["success"] is True
+    assert b"Parsed in the pipeline" in by_name["parsed.pdf"]["mp3"]
+
+@pytest.mark.asyncio
+async def test_iter_pdfs_to_mp3_yields_in_completion_order(monkeypatch):
+    """Should yield each file's result as soon as it finishes."""
+    async def fake_tts(text, out_path=None, voice="en-GB-RyanNeural", rate="+0%", connector=None):
+        await asyncio.sleep(0.05 if text == "slow" else 0)
+        return text.encode()
+
+    monkeypatch.setattr(tts_utils, "_async_tts", fake_tts)
+    files = [
+        {"name": "slow.pdf", "bytes": b"", "text": "slow"},
+        {"name": "fast.pdf", "bytes": b"", "text": "fast"},
+    ]
+    names = [r["name"] async for r in iter_pdfs_to_mp3(files, voice="en-GB-RyanNeural")]
+    assert names == ["fast.pdf", "slow.pdf"]
+
+def test_mp3_file_name():
+    """Should name the MP3 after the PDF's stem."""
+    assert mp3_file_name("report (2).pdf") == "report (2)_edge.mp3"
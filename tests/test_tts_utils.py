@@ -6,14 +6,16 @@ import os
 import asyncio
 import pytest
 from pathlib import Path
-from utils.tts_utils import batch_texts_to_mp3
+from utils.tts_utils import batch_texts_to_mp3, _join_mp3, _split, _strip_id3
 
-def test_batch_texts_to_mp3_empty():
+@pytest.mark.asyncio
+async def test_batch_texts_to_mp3_empty():
     """Should return empty list for empty tasks."""
-    results = asyncio.run(batch_texts_to_mp3([], voice="en-GB-RyanNeural"))
+    results = await batch_texts_to_mp3([], voice="en-GB-RyanNeural")
     assert results == []
 
-def test_batch_texts_to_mp3_success(tmp_path):
+@pytest.mark.asyncio
+async def test_batch_texts_to_mp3_success(tmp_path):
     """Should create an MP3 file for a simple text."""
     out_path = tmp_path / "test.mp3"
     tasks = [{
@@ -21,7 +23,115 @@ def test_batch_texts_to_mp3_success(tmp_path):
         "out_path": out_path,
         "name": "test.txt"
     }]
-    results = asyncio.run(batch_texts_to_mp3(tasks, voice="en-GB-RyanNeural"))
+    results = await batch_texts_to_mp3(tasks, voice="en-GB-RyanNeural")
     assert results[0]["success"] is True
     assert out_path.exists()
-    assert out_path.stat().st_size > 0
\ No newline at end of file
+    assert out_path.stat().st_size > 0
+
+def test_split_packs_sentences_up_to_limit():
+    """Should pack whole sentences into chunks no longer than max_chars."""
+    text = "One two. Three four! Five six? Seven eight."
+    chunks = _split(text, max_chars=15)
+    assert chunks == ["One two.", "Three four!", "Five six?", "Seven eight."]
+    assert _split(text, max_chars=25) == ["One two. Three four!", "Five six? Seven eight."]
+
+def test_split_keeps_long_sentence_whole():
+    """Should not break a sentence that alone exceeds max_chars."""
+    sentence = "a" * 50 + "."
+    assert _split(f"{sentence} Short.", max_chars=10) == [sentence, "Short."]
+
+def test_split_empty_text():
+    """Should return no chunks for blank text."""
+    assert _split("   ") == []
+
+@pytest.mark.asyncio
+async def test_batch_texts_to_mp3_labels_results_by_task(tmp_path, monkeypatch):
+    """Should attach each result to its own task even when tasks finish out of order."""
+    import utils.tts_utils as tts_utils
+
+    async def fake_tts(text, out_path, voice, rate, connector=None):
+        if text == "fail":
+            raise RuntimeError("boom")
+        await asyncio.sleep(0.05 if text == "slow" else 0)
+        return b"mp3"
+
+    monkeypatch.setattr(tts_utils, "_async_tts", fake_tts)
+    tasks = [
+        {"text": "slow", "out_path": tmp_path / "slow.mp3", "name": "slow.pdf"},
+        {"text": "fail", "out_path": tmp_path / "fail.mp3", "name": "fail.pdf"},
+        {"text": "fast", "out_path": tmp_path / "fast.mp3", "name": "fast.pdf"},
+    ]
+    results = await batch_texts_to_mp3(tasks, voice="en-GB-RyanNeural")
+    assert [r["name"] for r in results] == ["slow.pdf", "fail.pdf", "fast.pdf"]
+    assert results[0]["out_path"] == tmp_path / "slow.mp3"
+    assert results[1] == {"name": "fail.pdf", "success": False, "error": "boom"}
+    assert results[2]["success"] is True
+    assert results[2]["mp3"] == b"mp3"
+
+@pytest.mark.asyncio
+async def test_batch_texts_to_mp3_without_out_path(monkeypatch):
+    """Should return MP3 bytes in memory when a task has no out_path."""
+    import utils.tts_utils as tts_utils
+
+    async def fake_tts(text, out_path, voice, rate, connector=None):
+        assert out_path is None
+        return text.encode()
+
+    monkeypatch.setattr(tts_utils, "_async_tts", fake_tts)
+    tasks = [{"text": "in memory", "name": "mem.pdf"}]
+    results = await batch_texts_to_mp3(tasks, voice="en-GB-RyanNeural")
+    assert results == [{"name": "mem.pdf", "success": True, "mp3": b"in memory"}]
+
+@pytest.mark.asyncio
+async def test_shared_connector_survives_session_close():
+    """Should keep the connector open across sessions until the batch ends."""
+    import aiohttp
+    from utils.tts_utils import _shared_connector
+
+    async with _shared_connector() as connector:
+        for _ in range(2):
+            async with aiohttp.ClientSession(connector=connector):
+                pass
+            assert not connector.closed
+    assert connector.closed
+
+FRAME = b"\xff\xf3\x44\xc4" + b"\x00" * 12
+
+def _id3(payload: bytes) -> bytes:
+    size = len(payload)
+    syncsafe = bytes([(size >> 21) & 0x7F, (size >> 14) & 0x7F, (size >> 7) & 0x7F, size & 0x7F])
+    return b"ID3\x04\x00\x00" + syncsafe + payload
+
+def test_strip_id3():
+    """Should drop a leading ID3v2 tag and leave other data untouched."""
+    assert bytes(_strip_id3(_id3(b"x" * 200) + FRAME)) == FRAME
+    assert bytes(_strip_id3(FRAME)) == FRAME
+
+def test_join_mp3_strips_tags_after_first_chunk():
+    """Should keep the first chunk whole and drop ID3 tags from later chunks."""
+    first = _id3(b"tag") + FRAME
+    assert _join_mp3([first, _id3(b"tag") + FRAME, FRAME]) == first + FRAME + FRAME
+    assert _join_mp3([]) == b""
+
+def test_join_mp3_rejects_non_mp3():
+    """Should raise when the joined data doesn't start with a frame sync."""
+    with pytest.raises(ValueError):
+        _join_mp3([b"<html>error</html>"])
+
+@pytest.mark.asyncio
+async def test_batch_texts_to_mp3_keeps_caller_connector_open():
+    """Should leave a caller-supplied connector open for the next batch."""
+    from utils.tts_utils import make_shared_connector
+
+    connector = await make_shared_connector()
+    for _ in range(2):
+        assert await batch_texts_to_mp3([], voice="en-GB-RyanNeural", connector=connector) == []
+        assert not connector.closed
+    await connector.shutdown()
+    assert connector.closed
+
+def test_split_prefers_paragraph_breaks():
+    """Should keep paragraph breaks inside a chunk and pack across them."""
+    text = "First one. First two.\n\nSecond one.\n \nThird one."
+    assert _split(text) == ["First one. First two.\n\nSecond one.\n\nThird one."]
+    assert _split(text, max_chars=35) == ["First one. First two.\n\nSecond one.", "Third one."]
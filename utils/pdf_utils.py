@@ -2,37 +2,162 @@
 PDF extraction utilities for pdf-to-audiobook.
 """
 
+import concurrent.futures
+import hashlib
+import multiprocessing
+import os
+from typing import List, Optional, Tuple
+
 import fitz
 import streamlit as st
 
-@st.cache_data(show_spinner=False)
-def extract_text_from_pdf_bytes(pdf_bytes: bytes, file_name: str = "") -> str:
+# Plain-text extraction flags: keep whitespace and clip to the mediabox, but
+# skip ligature preservation (TTS reads expanded "fi" better than "\ufb01").
+_TEXT_FLAGS = fitz.TEXT_PRESERVE_WHITESPACE | fitz.TEXT_MEDIABOX_CLIP
+
+# Shared pool for CPU-bound parsing; worker processes start on first use and
+# are reused across batches. They come from a forkserver rather than a fork
+# of the Streamlit server, which is multi-threaded by then and could hand a
+# child a lock held at fork time.
+_PDF_POOL = concurrent.futures.ProcessPoolExecutor(
+    max_workers=os.cpu_count(),
+    mp_context=multiprocessing.get_context("forkserver"),
+)
+
+# Only PDFs longer than this are probed for being image-only
+_PROBE_MIN_PAGES = 10
+
+def _read_page(doc: fitz.Document, i: int, texts: List[str], failed_pages: List[int]) -> None:
     """
-    Extracts plain text from PDF bytes using PyMuPDF (fitz).
-    Skips unreadable pages and warns the user.
-    Returns the extracted text or an empty string on failure.
+    Stores page i's text in texts, recording its page number in failed_pages
+    if it can't be read.
+    """
+    try:
+        # Use more robust text extraction with better error handling
+        texts[i] = doc[i].get_text("text", flags=_TEXT_FLAGS)
+    except Exception:
+        failed_pages.append(i + 1)  # Skip this page but continue with others
+
+def _extract_core(pdf_bytes: bytes, file_name: str = "") -> Tuple[str, List[str], Optional[str]]:
     """
+    Extracts plain text from PDF bytes using PyMuPDF (fitz), without touching
+    Streamlit so it can run in a worker process.
+    Returns (text, page_warnings, error); error is None when the PDF opened.
+    """
+    warnings = []
     try:
         with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
-            texts = []
-            for i, page in enumerate(doc):
-                try:
-                    # Use more robust text extraction with better error handling
-                    text = page.get_text()
-                    if text.strip():  # Only add non-empty text
-                        texts.append(text)
-                except Exception as page_exc:
-                    st.warning(f"���️ Page {i+1} in **{file_name}** could not be read: {page_exc}")
-                    continue  # Skip this page but continue with others
-            
-            # Join all valid text blocks and clean up whitespace
-            full_text = "\n".join(texts).strip()
-            
-            # Additional cleanup: remove excessive whitespace
-            import re
-            full_text = re.sub(r'\s+', ' ', full_text)
-            
-            return full_text
+            # Pre-size the page list instead of growing it one append at a time
+            texts = [""] * doc.page_count
+            failed_pages = []
+            # Probe the first and middle pages of long PDFs: if both read fine
+            # and neither has text the PDF is almost certainly scanned, so
+            # skip the full walk
+            probed = set()
+            if doc.page_count > _PROBE_MIN_PAGES:
+                probed = {0, doc.page_count // 2}
+                for i in probed:
+                    _read_page(doc, i, texts, failed_pages)
+                if not failed_pages and not any(texts[i].strip() for i in probed):
+                    warnings.append(f"���️ **{file_name}** looks image-only (scanned) – OCR required.")
+                    return "", warnings, None
+            for i in range(doc.page_count):
+                if i not in probed:
+                    _read_page(doc, i, texts, failed_pages)
+            if failed_pages:
+                pages = ", ".join(map(str, sorted(failed_pages)))
+                warnings.append(f"���️ Page(s) {pages} in **{file_name}** could not be read.")
+
+            # Join all non-empty pages; line and paragraph breaks are kept as
+            # MuPDF emits them, since TTS uses them as pause cues
+            full_text = "\n".join(t for t in texts if t.strip()).strip()
+            return full_text, warnings, None
     except Exception as exc:
-        st.error(f"❌ Could not read PDF **{file_name}**: {exc}")
-        return ""
\ No newline at end of file
+        return "", warnings, f"❌ Could not read PDF **{file_name}**: {exc}"
+
+def _report(warnings: List[str], error: Optional[str]) -> None:
+    """
+    Surfaces diagnostics collected by _extract_core in the Streamlit UI.
+    """
+    for msg in warnings:
+        st.warning(msg)
+    if error:
+        st.error(error)
+
+def content_digest(data: bytes) -> bytes:
+    """
+    Fast content hash used as the cache key for PDF bytes.
+    """
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+class _CacheMiss(Exception):
+    """
+    Raised by _lookup_only so _extract_cached can be probed without parsing;
+    st.cache_data doesn't store results for calls that raise.
+    """
+
+def _lookup_only(pdf_bytes: bytes, file_name: str = "") -> Tuple[str, List[str], Optional[str]]:
+    """
+    Extractor for cache lookups: fails instead of parsing.
+    """
+    raise _CacheMiss
+
+@st.cache_data(show_spinner=False, persist="disk", max_entries=128)
+def _extract_cached(_pdf_bytes: bytes, digest: bytes, file_name: str, _extract=_extract_core) -> str:
+    """
+    Cached extraction keyed on the content digest; the leading underscores
+    keep Streamlit from hashing the PDF bytes and the extractor. Pass
+    _extract to look up (_lookup_only) or store an outcome computed elsewhere.
+    """
+    text, warnings, error = _extract(_pdf_bytes, file_name)
+    _report(warnings, error)
+    return text
+
+def extract_text_from_pdf_bytes(pdf_bytes: bytes, file_name: str = "", digest: Optional[bytes] = None) -> str:
+    """
+    Extracts plain text from PDF bytes using PyMuPDF (fitz).
+    Skips unreadable pages and warns the user.
+    Pass digest (from content_digest) when already known to skip re-hashing.
+    Returns the extracted text or an empty string on failure.
+    """
+    if digest is None:
+        digest = content_digest(pdf_bytes)
+    return _extract_cached(pdf_bytes, digest, file_name)
+
+def estimate_word_count(text: str) -> int:
+    """
+    Approximates the word count by counting separators, without building the
+    token list that len(text.split()) allocates.
+    """
+    if not text or text.isspace():
+        return 0
+    return text.count(" ") + text.count("\n") + 1
+
+def extract_texts_parallel(files: List[dict]) -> List[str]:
+    """
+    Extracts text from several PDFs at once on the shared process pool.
+    Each file is a dict with keys: bytes, name and optionally digest.
+    PDFs already in the digest-keyed cache are not parsed again, and new
+    results are written back to it.
+    Returns the texts in the same order as files.
+    """
+    digests = [f.get("digest") or content_digest(f["bytes"]) for f in files]
+    texts = [""] * len(files)
+    misses = []
+    for i, (f, digest) in enumerate(zip(files, digests)):
+        try:
+            texts[i] = _extract_cached(f["bytes"], digest, f["name"], _lookup_only)
+        except _CacheMiss:
+            misses.append(i)
+    if len(misses) < 2:
+        for i in misses:
+            texts[i] = _extract_cached(files[i]["bytes"], digests[i], files[i]["name"])
+        return texts
+    outcomes = _PDF_POOL.map(
+        _extract_core,
+        [files[i]["bytes"] for i in misses],
+        [files[i]["name"] for i in misses],
+    )
+    for i, outcome in zip(misses, outcomes):
+        texts[i] = _extract_cached(files[i]["bytes"], digests[i], files[i]["name"], lambda *_: outcome)
+    return texts
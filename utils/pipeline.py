@@ -0,0 +1,88 @@
+"""
+Extraction-to-TTS pipeline for pdf-to-audiobook.
+"""
+
+import asyncio
+from pathlib import Path
+from typing import AsyncIterator, List, Optional
+
+import aiohttp
+
+from utils.pdf_utils import _PDF_POOL, _extract_core
+from utils.tts_utils import CONCURRENCY_LIMIT, _run, _shared_connector
+
+NO_TEXT_ERROR = "No readable text found"
+
+def mp3_file_name(pdf_name: str) -> str:
+    """
+    Returns the download file name for the MP3 converted from pdf_name.
+    """
+    return f"{Path(pdf_name).stem}_edge.mp3"
+
+async def iter_pdfs_to_mp3(files: List[dict], voice: str, rate: str = "+0%", connector: Optional[aiohttp.BaseConnector] = None) -> AsyncIterator[dict]:
+    """
+    Converts PDFs to MP3 in a producer/consumer pipeline: each PDF is handed to
+    a TTS worker as soon as its text is ready, so synthesis overlaps parsing.
+    Each file is a dict with keys: name, bytes and optionally text (files that
+    already have text skip the parser). Pass connector (see
+    make_shared_connector) to reuse connections across batches.
+    Yields a result dict per file as soon as it finishes; successful results
+    carry the MP3 bytes under "mp3" and its download name under "file_name",
+    and any extraction diagnostics are listed under "warnings".
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=CONCURRENCY_LIMIT * 2)
+    finished: asyncio.Queue = asyncio.Queue()
+    sem = asyncio.Semaphore(CONCURRENCY_LIMIT)
+
+    async def produce(f):
+        text = f.get("text")
+        warnings = []
+        if text is None:
+            text, warnings, error = await loop.run_in_executor(_PDF_POOL, _extract_core, f["bytes"], f["name"])
+            if error:
+                warnings.append(error)
+        if not text:
+            await finished.put({"name": f["name"], "success": False, "error": NO_TEXT_ERROR, "warnings": warnings})
+            return
+        file_name = mp3_file_name(f["name"])
+        await queue.put({"text": text, "file_name": file_name, "name": f["name"], "warnings": warnings})
+
+    async def consume(connector):
+        while True:
+            task = await queue.get()
+            if task is None:
+                return
+            result = await _run(task, voice, rate, sem, connector)
+            result["warnings"] = task["warnings"]
+            if result["success"]:
+                result["file_name"] = task["file_name"]
+            await finished.put(result)
+
+    async def run(connector):
+        consumers = [asyncio.create_task(consume(connector)) for _ in range(CONCURRENCY_LIMIT)]
+        try:
+            await asyncio.gather(*[produce(f) for f in files])
+        finally:
+            for _ in consumers:
+                await queue.put(None)
+            await asyncio.gather(*consumers)
+            await finished.put(None)
+
+    async with _shared_connector(connector) as connector:
+        runner = asyncio.create_task(run(connector))
+        try:
+            while (result := await finished.get()) is not None:
+                yield result
+            await runner
+        finally:
+            if not runner.done():
+                runner.cancel()
+                await asyncio.gather(runner, return_exceptions=True)
+
+async def pdfs_to_mp3(files: List[dict], voice: str, rate: str = "+0%", connector: Optional[aiohttp.BaseConnector] = None) -> List[dict]:
+    """
+    Runs iter_pdfs_to_mp3 to completion.
+    Returns a list of result dicts in completion order.
+    """
+    return [result async for result in iter_pdfs_to_mp3(files, voice, rate, connector)]
@@ -3,42 +3,159 @@ TTS conversion utilities for pdf-to-audiobook.
 """
 
 import asyncio
+import contextlib
+import io
+import re
 from pathlib import Path
-from typing import List
+from typing import AsyncIterator, List, Optional
+
+import aiohttp
 from edge_tts import Communicate
 
 CONCURRENCY_LIMIT = 4  # Adjust as needed
+CHUNK_CHARS = 4000  # Max characters sent to Edge TTS per request
+
+def _split(text: str, max_chars: int = CHUNK_CHARS) -> List[str]:
+    """
+    Splits text on paragraph breaks, then sentence boundaries, and greedily
+    packs the pieces into chunks of at most max_chars (a single longer
+    sentence stays whole). Paragraph breaks inside a chunk are kept.
+    """
+    chunks = []
+    current = ""
+    for paragraph in re.split(r'\n\s*\n', text.strip()):
+        sep = "\n\n"
+        for sentence in re.split(r'(?<=[.!?])\s+', paragraph.strip()):
+            if not sentence:
+                continue
+            if current and len(current) + len(sep) + len(sentence) > max_chars:
+                chunks.append(current)
+                current = sentence
+            else:
+                current = f"{current}{sep}{sentence}" if current else sentence
+            sep = " "
+    if current:
+        chunks.append(current)
+    return chunks
+
+def _strip_id3(data: bytes) -> memoryview:
+    """
+    Returns a view of data without a leading ID3v2 tag (the tag size is a
+    28-bit syncsafe integer, plus 10 bytes of header and optional footer).
+    """
+    view = memoryview(data)
+    if len(data) < 10 or data[:3] != b"ID3":
+        return view
+    size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+    footer = 10 if data[5] & 0x10 else 0
+    return view[10 + size + footer:]
+
+def _join_mp3(parts: List[bytes]) -> bytes:
+    """
+    Concatenates per-chunk MP3 streams at the frame level, dropping ID3 tags
+    from every chunk after the first so decoders don't stall mid-stream.
+    Raises ValueError if the result doesn't start with an MPEG frame sync.
+    """
+    if not parts:
+        return b""
+    mp3 = b"".join([memoryview(parts[0])] + [_strip_id3(p) for p in parts[1:]])
+    audio = _strip_id3(mp3)
+    if len(audio) < 2 or (audio[0] << 8 | audio[1]) & 0xFFE0 != 0xFFE0:
+        raise ValueError("TTS output is not a valid MP3 stream")
+    return mp3
+
+class _SharedConnector(aiohttp.TCPConnector):
+    """
+    TCPConnector shared by every Communicate in a batch (or a whole session).
+    edge-tts closes the connector along with its per-request ClientSession, so
+    close() is a no-op here and the owner calls shutdown() when done with it.
+    """
+
+    def close(self, **kwargs):
+        return asyncio.sleep(0)
 
-async def _async_tts(text: str, out_path: Path, voice: str = "en-GB-RyanNeural", rate: str = "+0%"):
+    async def shutdown(self) -> None:
+        await super().close()
+
+async def make_shared_connector() -> aiohttp.BaseConnector:
     """
-    Asynchronously converts text to MP3 using Edge TTS and saves to out_path.
+    Creates a connector that survives edge-tts closing it, for callers that
+    want to reuse one across batches. Must be awaited on the loop that will
+    use it; release it with shutdown().
     """
+    return _SharedConnector(ttl_dns_cache=300)
+
+@contextlib.asynccontextmanager
+async def _shared_connector(connector: Optional[aiohttp.BaseConnector] = None) -> AsyncIterator[aiohttp.BaseConnector]:
+    """
+    Yields the caller's connector, or one (shared DNS cache and connection
+    limit) that lives for the duration of the batch.
+    """
+    if connector is not None:
+        yield connector
+        return
+    connector = await make_shared_connector()
     try:
-        communicate = Communicate(text=text, voice=voice, rate=rate)
-        await communicate.save(str(out_path))
+        yield connector
+    finally:
+        await connector.shutdown()
+
+async def _tts_chunk(text: str, voice: str, rate: str, sem: asyncio.Semaphore, connector: Optional[aiohttp.BaseConnector] = None) -> bytes:
+    """
+    Synthesizes one chunk of text and returns the MP3 bytes.
+    """
+    async with sem:
+        communicate = Communicate(text=text, voice=voice, rate=rate, connector=connector)
+        buf = io.BytesIO()
+        async for chunk in communicate.stream():
+            if chunk["type"] == "audio":
+                buf.write(chunk["data"])
+        return buf.getvalue()
+
+async def _async_tts(text: str, out_path: Optional[Path] = None, voice: str = "en-GB-RyanNeural", rate: str = "+0%", connector: Optional[aiohttp.BaseConnector] = None) -> bytes:
+    """
+    Asynchronously converts text to MP3 using Edge TTS and returns the bytes,
+    also saving them to out_path when one is given.
+    Long texts are split into chunks that are synthesized concurrently; the
+    MP3 streams are concatenated in order (MP3 frames are self-delimiting).
+    """
+    try:
+        sem = asyncio.Semaphore(CONCURRENCY_LIMIT)
+        parts = await asyncio.gather(*[
+            _tts_chunk(chunk, voice, rate, sem, connector) for chunk in _split(text)
+        ])
+        mp3 = _join_mp3(parts)
+        if out_path is not None:
+            Path(out_path).write_bytes(mp3)
+        return mp3
     except Exception as exc:
         raise RuntimeError(f"TTS conversion failed: {exc}")
 
-async def _async_tts_limited(text, out_path, voice, rate, sem):
-    async with sem:
-        await _async_tts(text, out_path, voice, rate)
+async def _run(task: dict, voice: str, rate: str, sem: asyncio.Semaphore, connector: Optional[aiohttp.BaseConnector] = None) -> dict:
+    """
+    Converts a single task and returns a result dict labelled with the task's
+    own name, so results stay correct whatever order tasks finish in.
+    """
+    try:
+        async with sem:
+            mp3 = await _async_tts(task["text"], task.get("out_path"), voice, rate, connector=connector)
+        result = {"name": task["name"], "success": True, "mp3": mp3}
+        if task.get("out_path") is not None:
+            result["out_path"] = task["out_path"]
+        return result
+    except Exception as exc:
+        return {"name": task["name"], "success": False, "error": str(exc)}
 
-async def batch_texts_to_mp3(tasks: List[dict], voice: str, rate: str = "+0%"):
+async def batch_texts_to_mp3(tasks: List[dict], voice: str, rate: str = "+0%", connector: Optional[aiohttp.BaseConnector] = None):
     """
     Runs TTS conversion for a batch of tasks in parallel, with concurrency limit.
-    Each task is a dict with keys: text, out_path, name.
-    Returns a list of result dicts.
+    Each task is a dict with keys: text, name and optionally out_path.
+    Pass connector (see make_shared_connector) to reuse connections across
+    batches. Returns a list of result dicts (with the MP3 bytes under "mp3")
+    in the same order as tasks.
     """
     sem = asyncio.Semaphore(CONCURRENCY_LIMIT)
-    coros = [
-        _async_tts_limited(task["text"], task["out_path"], voice, rate, sem)
-        for task in tasks
-    ]
-    results = []
-    for idx, coro in enumerate(asyncio.as_completed(coros), start=1):
-        try:
-            await coro
-            results.append({"name": tasks[idx-1]["name"], "success": True, "out_path": tasks[idx-1]["out_path"]})
-        except Exception as exc:
-            results.append({"name": tasks[idx-1]["name"], "success": False, "error": str(exc)})
-    return results
\ No newline at end of file
+    async with _shared_connector(connector) as connector:
+        return list(await asyncio.gather(*[
+            _run(task, voice, rate, sem, connector) for task in tasks
+        ]))